@@ -1,12 +1,94 @@
 import serial
-import json
 import numpy as np
+import matplotlib
+
+# Qt + Agg animates faster than the default TkAgg; let Agg simplify and
+# chunk long polylines
+matplotlib.use('QtAgg')
+matplotlib.rcParams['path.simplify'] = True
+matplotlib.rcParams['path.simplify_threshold'] = 1.0
+matplotlib.rcParams['agg.path.chunksize'] = 10000
+
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
-from collections import deque
+from numba import njit
 import threading
 import time
 
+@njit(cache=True, nogil=True)
+def scan_uint(buf, pos, size):
+    """
+    Read an unsigned decimal number starting at buf[pos]
+    
+    Returns:
+        (value, index after the digits); value is -1 if there are no
+        digits or the number does not fit in uint16
+    """
+    start = pos
+    value = 0
+    while pos < size and 48 <= buf[pos] <= 57:  # '0'-'9'
+        if value <= 65535:
+            value = value * 10 + (buf[pos] - 48)
+        pos += 1
+    if pos == start or value > 65535:
+        return -1, pos
+    return value, pos
+
+@njit(cache=True, nogil=True)
+def parse_frames(buf, out_a0, out_a1):
+    """
+    Validate and parse complete "[A0,A1]\n" lines (optional '\r') from a raw
+    serial byte buffer in a single pass. Any line that does not match
+    exactly - '#' monitoring messages, garbage, values over uint16 - is
+    skipped up to the next '\n'.
+    Runs without the GIL so decoding does not stall the plot thread
+    
+    Args:
+        buf: Raw received bytes (uint8 array)
+        out_a0: Output array for channel A0 values (int32)
+        out_a1: Output array for channel A1 values (int32)
+        
+    Returns:
+        (frames parsed, bytes consumed up to the last complete line)
+    """
+    size = buf.shape[0]
+    capacity = out_a0.shape[0]
+    count = 0
+    consumed = 0
+    pos = 0
+    
+    while pos < size and count < capacity:
+        i = pos
+        a0 = a1 = -1
+        valid = False
+        
+        if buf[i] == 91:  # '['
+            a0, i = scan_uint(buf, i + 1, size)
+            if a0 >= 0 and i < size and buf[i] == 44:  # ','
+                a1, i = scan_uint(buf, i + 1, size)
+                if a1 >= 0 and i < size and buf[i] == 93:  # ']'
+                    i += 1
+                    if i < size and buf[i] == 13:  # '\r'
+                        i += 1
+                    valid = i < size and buf[i] == 10  # '\n'
+                    
+        # Resync on the end of line - an incomplete last line is left
+        # unconsumed for the next read
+        while i < size and buf[i] != 10:
+            i += 1
+        if i >= size:
+            break
+            
+        if valid:
+            out_a0[count] = a0
+            out_a1[count] = a1
+            count += 1
+            
+        pos = i + 1
+        consumed = pos
+        
+    return count, consumed
+
 class RealTimeEKGPlotter:
     def __init__(self, port='COM3', baudrate=250000, buffer_size=2000):
         """
@@ -21,17 +103,36 @@ class RealTimeEKGPlotter:
         self.baudrate = baudrate
         self.buffer_size = buffer_size
         
-        # Data buffers
-        self.ch0_data = deque(maxlen=buffer_size)
-        self.ch1_data = deque(maxlen=buffer_size)
-        self.time_data = deque(maxlen=buffer_size)
+        # Data buffers - preallocated ring buffers, one array per channel
+        # (uint16 is enough for the 12-bit ADC values). Timestamps are not
+        # stored: sample i is at i / _est_rate seconds.
+        self._a0 = np.empty(buffer_size, dtype=np.uint16)
+        self._a1 = np.empty_like(self._a0)
+        self._est_rate = None  # Estimated sample rate in Hz
+        
+        # Total number of samples written (the ring position is
+        # _write_idx % buffer_size). Only the serial thread writes it, after
+        # the samples are stored; the GUI reads it once per frame as a
+        # snapshot. There is no read index: once the ring has wrapped the
+        # serial thread may overwrite the oldest slots while the GUI copies
+        # them, which at worst shows a few newer samples at the left edge.
+        self._write_idx = 0
         
         # Serial connection
         self.serial_conn = None
         self.is_running = False
         
+        # Plot state - the X axis is a fixed window ending at the newest
+        # sample, so X values only change with the point count or the rate
+        self.window_size = 10  # seconds
+        self._xs_key = None
+        
+        # Y limits only move when the data leaves the band (see update_plot)
+        self._y_lo = [None, None]
+        self._y_hi = [None, None]
+        self._y_span = [0, 0]
+        
         # Statistics
-        self.sample_count = 0
         self.start_time = time.time()
         
         # Setup plot
@@ -42,14 +143,16 @@ class RealTimeEKGPlotter:
         self.fig, (self.ax1, self.ax2) = plt.subplots(2, 1, figsize=(12, 8))
         
         # Channel 0 plot
-        self.line1, = self.ax1.plot([], [], 'b-', linewidth=1.5, label='Channel A0')
+        self.line1, = self.ax1.plot([], [], 'b-', linewidth=1.5, label='Channel A0',
+                                    animated=True)
         self.ax1.set_title('EKG Channel A0', fontsize=14)
         self.ax1.set_ylabel('12-bit ADC Value')
         self.ax1.grid(True, alpha=0.3)
         self.ax1.legend()
         
         # Channel 1 plot
-        self.line2, = self.ax2.plot([], [], 'r-', linewidth=1.5, label='Channel A1')
+        self.line2, = self.ax2.plot([], [], 'r-', linewidth=1.5, label='Channel A1',
+                                    animated=True)
         self.ax2.set_title('EKG Channel A1', fontsize=14)
         self.ax2.set_xlabel('Time (seconds)')
         self.ax2.set_ylabel('12-bit ADC Value')
@@ -57,8 +160,8 @@ class RealTimeEKGPlotter:
         self.ax2.legend()
         
         # Set initial limits
-        self.ax1.set_xlim(0, 10)  # 10 seconds window
-        self.ax2.set_xlim(0, 10)
+        self.ax1.set_xlim(0, self.window_size)  # Newest sample at the right edge
+        self.ax2.set_xlim(0, self.window_size)
         self.ax1.set_ylim(0, 4095)  # 12-bit range
         self.ax2.set_ylim(0, 4095)
         
@@ -76,75 +179,157 @@ class RealTimeEKGPlotter:
             
     def read_serial_data(self):
         """Thread function to read serial data continuously"""
+        buffer = b''
+        rate_idx = rate_time = None  # Anchor for the sample rate estimate
+        
+        # Parser output, allocated once and reused for every burst
+        out_a0 = np.empty(8192, dtype=np.int32)
+        out_a1 = np.empty(8192, dtype=np.int32)
+        
         while self.is_running and self.serial_conn:
             try:
-                line = self.serial_conn.readline().decode('utf-8').strip()
+                # Drain everything already received in one call (at least 1 byte
+                # so the read still blocks up to the port timeout when idle)
+                buffer += self.serial_conn.read(max(1, self.serial_conn.in_waiting))
+                
+                # Parse all complete lines, keep the trailing partial line
+                count, consumed = parse_frames(
+                    np.frombuffer(buffer, dtype=np.uint8), out_a0, out_a1
+                )
+                buffer = buffer[consumed:]
                 
-                # Skip empty lines and monitoring messages
-                if not line or line.startswith('#'):
-                    continue
+                if count > 0:
+                    # Add to buffers
+                    self.append_samples(out_a0[:count], out_a1[:count])
                     
-                # Parse JSON format [A0,A1]
-                if line.startswith('[') and line.endswith(']'):
-                    try:
-                        data = json.loads(line)
-                        if len(data) == 2:
-                            current_time = time.time() - self.start_time
-                            
-                            # Add to buffers
-                            self.ch0_data.append(data[0])
-                            self.ch1_data.append(data[1])
-                            self.time_data.append(current_time)
-                            
-                            self.sample_count += 1
-                            
-                    except json.JSONDecodeError:
-                        continue  # Skip invalid JSON
+                    # Re-estimate the sample rate every 256 samples, smoothed
+                    # so a single late burst does not shift the time axis
+                    if rate_time is None:
+                        rate_idx, rate_time = self._write_idx, time.perf_counter()
+                    elif self._write_idx - rate_idx >= 256:
+                        now = time.perf_counter()
+                        rate = (self._write_idx - rate_idx) / (now - rate_time)
+                        if self._est_rate is None:
+                            self._est_rate = rate
+                        else:
+                            self._est_rate = 0.9 * self._est_rate + 0.1 * rate
+                        rate_idx, rate_time = self._write_idx, now
                         
             except Exception as e:
                 print(f"Serial read error: {e}")
                 break
                 
+    def append_samples(self, a0, a1):
+        """
+        Write a block of samples into the ring buffers (serial thread only)
+        The new samples become visible to the GUI once _write_idx is updated
+        """
+        total = len(a0)
+        n = min(total, self.buffer_size)
+        if n < total:
+            # Only the newest buffer_size samples can be kept
+            a0 = a0[-n:]
+            a1 = a1[-n:]
+            
+        # Copy in at most two slices, wrapping at the end of the buffer
+        idx = (self._write_idx + total - n) % self.buffer_size
+        first = min(n, self.buffer_size - idx)
+        for buf, values in ((self._a0, a0), (self._a1, a1)):
+            buf[idx:idx + first] = values[:first]
+            buf[:n - first] = values[first:]
+            
+        # Publish
+        self._write_idx += total
+        
+    def ordered_data(self, end):
+        """
+        Return (ch0, ch1) up to sample number `end`, oldest sample first
+        Returns views of the ring buffers; only copies once they have wrapped
+        """
+        idx, count = end % self.buffer_size, min(end, self.buffer_size)
+        
+        if count < self.buffer_size:
+            return self._a0[:count], self._a1[:count]
+        if idx == 0:
+            return self._a0, self._a1
+        return (np.concatenate((self._a0[idx:], self._a0[:idx])),
+                np.concatenate((self._a1[idx:], self._a1[:idx])))
+        
+    def sample_rate(self, end):
+        """
+        Sample rate in Hz for the index -> time mapping: the running estimate,
+        or the average since start until the first estimate (256 samples) exists
+        """
+        if self._est_rate is not None:
+            return self._est_rate
+        elapsed = time.time() - self.start_time
+        return end / elapsed if end and elapsed > 0 else None
+        
     def update_plot(self, frame):
-        """Animation function to update plots"""
-        if len(self.time_data) < 2:
+        """
+        Animation function to update plots
+        Only the two lines are blitted each frame; axes, ticks and titles come
+        from a cached background that is redrawn only when they change
+        """
+        # Snapshot the producer index once; everything below uses [.., end)
+        end = self._write_idx
+        rate = self.sample_rate(end)
+        if end < 2 or rate is None:
             return self.line1, self.line2
             
-        # Convert to numpy arrays for plotting
-        times = np.array(list(self.time_data))
-        ch0_values = np.array(list(self.ch0_data))
-        ch1_values = np.array(list(self.ch1_data))
-        
-        # Update line data
-        self.line1.set_data(times, ch0_values)
-        self.line2.set_data(times, ch1_values)
-        
-        # Auto-scale time axis (rolling window)
-        if len(times) > 0:
-            current_time = times[-1]
-            window_size = 10  # seconds
-            
-            self.ax1.set_xlim(max(0, current_time - window_size), current_time + 1)
-            self.ax2.set_xlim(max(0, current_time - window_size), current_time + 1)
+        # Read the ring buffers in time order
+        ch0_values, ch1_values = self.ordered_data(end)
+        count = len(ch0_values)
+        
+        # X values (seconds, newest sample at window_size) are rebuilt only
+        # when the point count or rate estimate changes
+        key = (count, rate)
+        if key != self._xs_key:
+            ages = np.arange(count - 1, -1, -1, dtype=np.float32) / np.float32(rate)
+            xs = self.window_size - ages
+            self.line1.set_xdata(xs)
+            self.line2.set_xdata(xs)
+            self._xs_key = key
             
-        # Auto-scale Y axis based on visible data
-        if len(ch0_values) > 0:
-            margin = 200
-            self.ax1.set_ylim(min(ch0_values) - margin, max(ch0_values) + margin)
-            self.ax2.set_ylim(min(ch1_values) - margin, max(ch1_values) + margin)
+        # Per frame only the Y data changes
+        self.line1.set_ydata(ch0_values)
+        self.line2.set_ydata(ch1_values)
+        
+        # Y limits and titles are part of the blit background - any change
+        # needs one full redraw before the lines are blitted on top
+        redraw = False
+        
+        # Auto-scale Y axis only when the data leaves the current band or
+        # shrinks to under half of the span it was fitted to
+        margin = 200
+        for i, (ax, values) in enumerate(((self.ax1, ch0_values), (self.ax2, ch1_values))):
+            lo, hi = int(values.min()), int(values.max())
+            if (self._y_lo[i] is None or lo < self._y_lo[i] or hi > self._y_hi[i]
+                    or (hi - lo) * 2 < self._y_span[i]):
+                pad = max((hi - lo) * 0.1, margin)  # 10% headroom
+                self._y_lo[i], self._y_hi[i] = lo - pad, hi + pad
+                self._y_span[i] = hi - lo
+                ax.set_ylim(self._y_lo[i], self._y_hi[i])
+                redraw = True
             
         # Update title with sample rate
         if hasattr(self, 'last_rate_update'):
             if time.time() - self.last_rate_update > 1.0:  # Update every second
                 elapsed = time.time() - self.start_time
                 if elapsed > 0:
-                    rate = self.sample_count / elapsed
-                    self.ax1.set_title(f'EKG Channel A0 - Rate: {rate:.1f} Hz')
-                    self.ax2.set_title(f'EKG Channel A1 - Rate: {rate:.1f} Hz')
+                    sample_rate = end / elapsed
+                    self.ax1.set_title(f'EKG Channel A0 - Rate: {sample_rate:.1f} Hz')
+                    self.ax2.set_title(f'EKG Channel A1 - Rate: {sample_rate:.1f} Hz')
+                    redraw = True
                 self.last_rate_update = time.time()
         else:
             self.last_rate_update = time.time()
             
+        if redraw:
+            # Animated lines are skipped here; FuncAnimation re-caches the
+            # background for the new view and blits the lines afterwards
+            self.fig.canvas.draw()
+            
         return self.line1, self.line2
         
     def start_plotting(self):
@@ -162,7 +347,8 @@ class RealTimeEKGPlotter:
         
         # Start animation
         ani = animation.FuncAnimation(
-            self.fig, self.update_plot, interval=50, blit=False
+            self.fig, self.update_plot, interval=50, blit=True,
+            cache_frame_data=False
         )
         
         print("Starting real-time plot... Close window to stop.")
@@ -175,21 +361,23 @@ class RealTimeEKGPlotter:
             
     def save_data_to_file(self, filename="ekg_data.csv"):
         """Save collected data to CSV file"""
-        if len(self.time_data) == 0:
+        end = self._write_idx
+        rate = self.sample_rate(end)
+        if rate is None:
             print("No data to save")
             return
             
-        import pandas as pd
-        
-        # Create DataFrame
-        df = pd.DataFrame({
-            'time': list(self.time_data),
-            'channel_a0': list(self.ch0_data),
-            'channel_a1': list(self.ch1_data)
-        })
+        ch0_values, ch1_values = self.ordered_data(end)
+        count = len(ch0_values)
+        times = np.arange(end - count, end) / rate
         
-        # Save to CSV
-        df.to_csv(filename, index=False)
+        # Write the arrays directly, without building Python lists
+        np.savetxt(
+            filename, np.column_stack((times, ch0_values, ch1_values)),
+            fmt=['%.6f', '%d', '%d'], delimiter=',',
+            header='time,channel_a0,channel_a1', comments=''
+        )
+            
         print(f"Data saved to {filename}")
         
 def main():
@@ -10,7 +10,6 @@ import json
 import time
 import threading
 import asyncio
-from collections import deque
 from datetime import datetime
 
 import numpy as np
@@ -30,6 +29,12 @@ import re
 class DataProcessor:
     """Handle EKG data processing and validation"""
     
+    # ASCII code -> hex nibble lookup table (255 marks a non-hex character)
+    HEX_LUT = np.full(256, 255, dtype=np.uint8)
+    HEX_LUT[ord('0'):ord('9') + 1] = np.arange(10)
+    HEX_LUT[ord('A'):ord('F') + 1] = np.arange(10, 16)
+    HEX_LUT[ord('a'):ord('f') + 1] = np.arange(10, 16)
+    
     @staticmethod
     def process_value(raw_value):
         """
@@ -48,24 +53,46 @@ class DataProcessor:
     def parse_hex_line(hex_line):
         """
         Parse single line of hex data to 12 processed values
+        Fixed-width lines ('%03X' tokens) are decoded in one NumPy pass,
+        anything else falls back to per-token parsing
         Args: hex_line (str) - "800,801,802,C00,..."
-        Returns: list - 12 processed decimal values
+        Returns: np.ndarray - 12 processed values (uint16), or None if invalid
         """
         try:
-            hex_values = hex_line.strip().split(',')
+            raw = hex_line.strip().encode('ascii')
+        except (UnicodeEncodeError, AttributeError):
+            return None
+        
+        # Fixed layout: 12 tokens of 3 hex digits, commas at every 4th byte
+        if len(raw) != 47 or raw[3::4] != b',' * 11:
+            return DataProcessor.parse_hex_tokens(raw)
+        
+        digits = np.frombuffer(raw.replace(b',', b''), dtype=np.uint8).reshape(12, 3)
+        nibbles = DataProcessor.HEX_LUT[digits].astype(np.uint16)
+        if (nibbles > 15).any():
+            return None
+        
+        values = (nibbles[:, 0] << 8) | (nibbles[:, 1] << 4) | nibbles[:, 2]
+        return np.minimum(values, 4095, out=values)
+    
+    @staticmethod
+    def parse_hex_tokens(raw_line):
+        """
+        Per-token fallback for lines that are not fixed-width
+        Args: raw_line (bytes) - b"800,1,FF,C00,..."
+        Returns: np.ndarray - 12 processed values (uint16), or None if invalid
+        """
+        try:
+            hex_values = raw_line.split(b',')
             if len(hex_values) != 12:
                 return None
             
             # Convert hex to decimal and process each value
-            processed_values = []
-            for hex_val in hex_values:
-                decimal_val = int(hex_val, 16)
-                processed_val = DataProcessor.process_value(decimal_val)
-                processed_values.append(processed_val)
-            
-            return processed_values
+            processed_values = [DataProcessor.process_value(int(hex_val, 16))
+                                for hex_val in hex_values]
+            return np.array(processed_values, dtype=np.uint16)
         
-        except (ValueError, AttributeError):
+        except ValueError:
             return None
 
 class WebSocketThread(QThread):
@@ -74,7 +101,7 @@ class WebSocketThread(QThread):
     Runs in separate thread to avoid blocking UI
     """
     # Qt signals for thread-safe communication with main UI thread
-    data_received = pyqtSignal(list)  # Emits list of 12-channel data
+    data_received = pyqtSignal(object)  # Emits (n, 12) np.ndarray of channel data
     connection_status = pyqtSignal(str)  # Emits connection status string
     
     def __init__(self):
@@ -82,12 +109,17 @@ class WebSocketThread(QThread):
         self.server_ip = "0.0.0.0"
         self.server_port = 8765
         self.running = True
+        
+        # Set from stop() to end start_server (created on the server loop)
+        self._loop = None
+        self._stop_event = None
     
     def run(self):
         """Main thread execution - runs WebSocket server"""
         # Create new event loop for this thread (required for asyncio)
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
+        self._loop = loop
         
         try:
             # Start WebSocket server in this thread's event loop
@@ -100,13 +132,21 @@ class WebSocketThread(QThread):
     async def start_server(self):
         """Start WebSocket server and handle connections"""
         self.connection_status.emit("Server Starting...")
-        
-        async with websockets.serve(self.handle_client, self.server_ip, self.server_port):
+        self._stop_event = asyncio.Event()
+        
+        # Frames are small hex text: skip permessage-deflate and cap frame size
+        async with websockets.serve(
+            self.handle_client,
+            self.server_ip,
+            self.server_port,
+            compression=None,
+            max_size=2**16
+        ):
             self.connection_status.emit(f"Server Running on {self.server_ip}:{self.server_port}")
             
-            # Keep server running until thread is stopped
-            while self.running:
-                await asyncio.sleep(0.1)
+            # Keep server running until stop() sets the event
+            if self.running:
+                await self._stop_event.wait()
     
     async def handle_client(self, websocket, path):
         """
@@ -117,6 +157,19 @@ class WebSocketThread(QThread):
         client_ip = websocket.remote_address[0] if websocket.remote_address else "unknown"
         self.connection_status.emit(f"ESP32 Connected: {client_ip}")
         
+        # Rows are sent to the UI in batches - one queued Qt signal per
+        # 32 rows or 20 ms instead of one per row
+        loop = asyncio.get_running_loop()
+        batch = []
+        flush_handle = None
+        
+        def flush():
+            nonlocal flush_handle
+            if flush_handle is not None:
+                flush_handle.cancel()
+                flush_handle = None
+            self.emit_batch(batch)
+        
         try:
             async for message in websocket:
                 if isinstance(message, str) and message.strip():
@@ -128,9 +181,15 @@ class WebSocketThread(QThread):
                             # Process each line of 12-channel hex data
                             processed_data = DataProcessor.parse_hex_line(line)
                             
-                            if processed_data and len(processed_data) == 12:
-                                # Emit data to main UI thread via Qt signal
-                                self.data_received.emit(processed_data)
+                            if processed_data is not None:
+                                batch.append(processed_data)
+                    
+                    # Emit data to main UI thread via Qt signal - a timer
+                    # flushes leftover rows even if no further message arrives
+                    if len(batch) >= 32:
+                        flush()
+                    elif batch and flush_handle is None:
+                        flush_handle = loop.call_later(0.02, flush)
                     
                     # Send acknowledgment back to ESP32
                     try:
@@ -142,10 +201,25 @@ class WebSocketThread(QThread):
             self.connection_status.emit(f"ESP32 Disconnected: {client_ip}")
         except Exception as e:
             self.connection_status.emit(f"Connection Error: {e}")
+        finally:
+            flush()
+    
+    def emit_batch(self, batch):
+        """Emit collected rows as one (n, 12) array and clear the batch"""
+        if batch:
+            self.data_received.emit(np.vstack(batch))
+            batch.clear()
     
     def stop(self):
         """Stop the WebSocket thread"""
         self.running = False
+        
+        # Wake start_server on its own loop (no-op if it is not waiting yet)
+        if self._loop and self._stop_event:
+            try:
+                self._loop.call_soon_threadsafe(self._stop_event.set)
+            except RuntimeError:
+                pass  # Loop already closed
 
 class EKGPlotWidget(QWidget):
     """
@@ -156,10 +230,12 @@ class EKGPlotWidget(QWidget):
     def __init__(self):
         super().__init__()
         
-        # Data storage - deque for efficient append/pop operations
+        # Data storage - preallocated ring buffers, position = index % max_samples
+        self.sample_rate = 40  # Nominal rows per second
         self.max_samples = 400  # 10 seconds at ~40 Hz
-        self.time_data = deque(maxlen=self.max_samples)
-        self.ekg_data = deque(maxlen=self.max_samples)
+        self._t = np.empty(self.max_samples, dtype=np.float64)
+        self._y = np.empty(self.max_samples, dtype=np.uint16)
+        self._write_idx = 0  # Total samples written
         
         # Selected channel (0-11)
         self.selected_channel = 0
@@ -167,6 +243,13 @@ class EKGPlotWidget(QWidget):
         # Setup matplotlib figure and canvas
         self.setup_plot()
         
+        # Redraw at a fixed ~30 FPS, independent of the data rate;
+        # add_data_batch only marks the plot as dirty
+        self._dirty = False
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.maybe_redraw)
+        self._timer.start(33)
+        
         # Layout
         layout = QVBoxLayout()
         layout.addWidget(self.canvas)
@@ -195,33 +278,67 @@ class EKGPlotWidget(QWidget):
         # Tight layout to prevent clipping
         self.figure.tight_layout()
     
-    def add_data_point(self, channel_data):
+    def add_data_batch(self, batch):
         """
-        Add new 12-channel data point to buffer
-        Args: channel_data (list) - List of 12 processed channel values
+        Add a batch of 12-channel data points to the buffer
+        Args: batch (np.ndarray) - (n, 12) array of processed channel values
         """
-        if len(channel_data) != 12:
+        if batch.ndim != 2 or batch.shape[1] != 12:
             return
         
-        # Add timestamp and selected channel data
+        # Timestamps spread evenly between the previous batch and now, but
+        # over no more than the batch's duration at the nominal rate - after
+        # a pause (reconnect, stall) the gap stays empty instead of being
+        # filled with a few stretched-out rows
+        total = len(batch)
         current_time = time.time()
-        channel_value = channel_data[self.selected_channel]
-        
-        self.time_data.append(current_time)
-        self.ekg_data.append(channel_value)
-        
-        # Update plot if we have data
-        if len(self.time_data) > 1:
+        earliest = current_time - total / self.sample_rate
+        if self._write_idx > 0:
+            last_time = max(self._t[(self._write_idx - 1) % self.max_samples], earliest)
+        else:
+            last_time = earliest
+        times = np.linspace(last_time, current_time, total + 1)[1:]
+        
+        # Only the newest max_samples points fit in the buffer
+        n = min(total, self.max_samples)
+        values = batch[-n:, self.selected_channel]
+        times = times[-n:]
+        
+        # Copy in at most two slices, wrapping at the end of the buffer
+        pos = (self._write_idx + total - n) % self.max_samples
+        first = min(n, self.max_samples - pos)
+        for buf, new_values in ((self._t, times), (self._y, values)):
+            buf[pos:pos + first] = new_values[:first]
+            buf[:n - first] = new_values[first:]
+        self._write_idx += total
+        self._dirty = True
+    
+    def maybe_redraw(self):
+        """Redraw if new data arrived since the last frame (render timer slot)"""
+        if self._dirty:
+            self._dirty = False
             self.update_plot()
     
+    def ordered_data(self):
+        """
+        Return (times, values) from the ring buffers, oldest sample first
+        Returns views until the buffers wrap, then a single concatenated copy
+        """
+        end = self._write_idx
+        if end <= self.max_samples:
+            return self._t[:end], self._y[:end]
+        
+        pos = end % self.max_samples
+        return (np.concatenate((self._t[pos:], self._t[:pos])),
+                np.concatenate((self._y[pos:], self._y[:pos])))
+    
     def update_plot(self):
         """Update matplotlib plot with latest data"""
-        if len(self.time_data) < 2:
+        if self._write_idx < 2:
             return
         
-        # Convert deque to numpy arrays for plotting
-        times = np.array(self.time_data)
-        values = np.array(self.ekg_data)
+        # Read the ring buffers in time order
+        times, values = self.ordered_data()
         
         # Normalize time to show last 10 seconds (relative time)
         latest_time = times[-1]
@@ -232,7 +349,7 @@ class EKGPlotWidget(QWidget):
         
         # Auto-scale Y axis to fit data with some padding
         if len(values) > 0:
-            y_min, y_max = values.min(), values.max()
+            y_min, y_max = int(values.min()), int(values.max())
             y_padding = (y_max - y_min) * 0.1 if y_max > y_min else 200
             self.ax.set_ylim(y_min - y_padding, y_max + y_padding)
         
@@ -250,8 +367,8 @@ class EKGPlotWidget(QWidget):
         self.selected_channel = new_channel
         
         # Clear current data for clean channel switch
-        self.time_data.clear()
-        self.ekg_data.clear()
+        self._write_idx = 0
+        self._dirty = False
         
         # Update plot title
         self.ax.set_title(f'Real-time EKG - Channel {self.selected_channel}', 
@@ -350,17 +467,17 @@ class MainWindow(QMainWindow):
         """
         self.plot_widget.change_channel(index)
     
-    def on_data_received(self, channel_data):
+    def on_data_received(self, batch):
         """
-        Handle new 12-channel data from ESP32
-        Args: channel_data (list) - List of 12 processed channel values
+        Handle new batch of 12-channel data from ESP32
+        Args: batch (np.ndarray) - (n, 12) array of processed channel values
         Called via Qt signal from WebSocket thread
         """
         # Update plot with new data
-        self.plot_widget.add_data_point(channel_data)
+        self.plot_widget.add_data_batch(batch)
         
         # Update statistics
-        self.total_samples += 1
+        self.total_samples += len(batch)
     
     def on_connection_status(self, status):
         """
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """
 Single Channel PyQt5 EKG Visualizer
-Receives single channel hex data from ESP32 via WebSocket (100ms updates)
+Receives single channel data from ESP32 via WebSocket (100ms updates):
+binary frames of little-endian uint16 samples, or legacy comma-separated hex text
 Real-time plotting with fixed Y-axis and 10-second window
 """
 
@@ -9,7 +10,6 @@ import sys
 import time
 import threading
 import asyncio
-from collections import deque
 from datetime import datetime
 
 import numpy as np
@@ -24,46 +24,149 @@ from PyQt5.QtCore import QTimer, pyqtSignal, QObject, QThread
 from PyQt5.QtGui import QFont
 
 import websockets
+from numba import njit
+
+# uvloop (Linux/macOS only) gives a faster event loop for the WebSocket server
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+@njit(cache=True, boundscheck=False)
+def parse_hex_tokens(buf, out):
+    """
+    Parse comma-separated hex tokens from raw ASCII bytes in one pass
+    Whitespace and empty tokens are skipped, values are clamped to 4095 and
+    invalid hex digits decode as 0 (nothing raises or aborts the message)
+    
+    Args:
+        buf: Raw message bytes (uint8 array)
+        out: Output array for parsed values (uint16), at least len(buf) // 2 + 1
+        
+    Returns:
+        Number of values written
+    """
+    count = 0
+    acc = 0
+    digits = 0
+    
+    for i in range(buf.shape[0] + 1):
+        c = buf[i] if i < buf.shape[0] else 44  # Treat end of data as ','
+        
+        if c == 44:  # ','
+            if digits > 0:
+                out[count] = min(acc, 4095)
+                count += 1
+            acc = 0
+            digits = 0
+        elif c == 32 or c == 9 or c == 10 or c == 13:  # Whitespace
+            continue
+        else:
+            if 48 <= c <= 57:  # '0'-'9'
+                nibble = c - 48
+            else:
+                # Fold 'A'-'F' onto 'a'-'f' - only letters are folded, so
+                # control bytes cannot alias digits
+                c |= 0x20
+                if 97 <= c <= 102:
+                    nibble = c - 87
+                else:
+                    nibble = 0  # Malformed digit
+            if acc <= 4095:  # Stop growing once clamped
+                acc = (acc << 4) | nibble
+            digits += 1
+    
+    return count
+
+@njit(cache=True)
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling
+    Keeps the point of each bucket that forms the largest triangle with the
+    previously kept point and the average of the next bucket, so peaks survive
+    
+    Args:
+        x: X values (increasing)
+        y: Y values, same length as x (more than n_out points)
+        n_out: Number of points to keep (at least 3)
+        
+    Returns:
+        Indices of the kept points, first and last point always included
+    """
+    n = x.shape[0]
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0] = 0
+    keep[n_out - 1] = n - 1
+    
+    # The first and last points are fixed, the rest is split into buckets
+    bucket = (n - 2) / (n_out - 2)
+    a = 0
+    
+    for i in range(n_out - 2):
+        # Third triangle vertex: average of the next bucket
+        start = int((i + 1) * bucket) + 1
+        end = min(int((i + 2) * bucket) + 1, n)
+        avg_x = 0.0
+        avg_y = 0.0
+        for j in range(start, end):
+            avg_x += x[j]
+            avg_y += y[j]
+        avg_x /= end - start
+        avg_y /= end - start
+        
+        # Point of the current bucket with the largest triangle area
+        ax = x[a]
+        ay = y[a]
+        best_area = -1.0
+        best = start - 1
+        for j in range(int(i * bucket) + 1, start):
+            area = abs((ax - avg_x) * (y[j] - ay) - (ax - x[j]) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+        
+        keep[i + 1] = best
+        a = best
+    
+    return keep
 
 class DataProcessor:
     """Handle single channel EKG data processing and validation"""
     
     @staticmethod
-    def process_value(raw_value):
+    def parse_binary_data(frame):
         """
-        Clamp EKG data to valid 12-bit range (0-4095)
-        Args: raw_value (int) - Raw decimal value from hex conversion
-        Returns: int - Clamped value between 0-4095
+        Parse binary frame of little-endian uint16 samples
+        Args: frame (bytes) - 2 bytes per sample, a trailing odd byte is ignored
+        Returns: np.ndarray - 12-bit values as uint16 (clamped to 4095)
         """
-        if raw_value < 0:
-            return 0
-        elif raw_value > 4095:
-            return 4095
-        else:
-            return raw_value
+        values = np.frombuffer(frame, dtype='<u2', count=len(frame) // 2).astype(np.uint16)
+        np.minimum(values, 4095, out=values)
+        return values
     
     @staticmethod
-    def parse_hex_data(hex_data):
+    def parse_hex_data(hex_data, out=None):
         """
         Parse single line of hex data to processed values
-        Args: hex_data (str) - "800,801,802,803,..."
-        Returns: list - Processed decimal values
+        Decoding runs in the compiled parse_hex_tokens kernel
+        Args: hex_data (str or bytes) - "800,801,802,803,..."
+              out (np.ndarray) - Optional reusable uint16 scratch buffer
+        Returns: np.ndarray - Processed 12-bit values as uint16
         """
-        try:
-            hex_values = hex_data.strip().split(',')
-            
-            # Convert hex to decimal and process each value
-            processed_values = []
-            for hex_val in hex_values:
-                if hex_val.strip():  # Skip empty values
-                    decimal_val = int(hex_val, 16)
-                    processed_val = DataProcessor.process_value(decimal_val)
-                    processed_values.append(processed_val)
-            
-            return processed_values
-        
-        except (ValueError, AttributeError):
-            return []
+        # Bytes are used as-is; text is encoded once, with non-ASCII characters
+        # becoming '?' which decodes as 0 like any bad digit
+        if isinstance(hex_data, str):
+            hex_data = hex_data.encode('ascii', 'replace')
+        raw = np.frombuffer(hex_data, dtype=np.uint8)
+        
+        # Every value needs at least one digit and a comma
+        if out is None or len(out) < len(raw) // 2 + 1:
+            out = np.empty(len(raw) // 2 + 1, dtype=np.uint16)
+        
+        count = parse_hex_tokens(raw, out)
+        
+        # Copy out of the scratch buffer, it is reused for the next message
+        return out[:count].copy()
 
 class WebSocketThread(QThread):
     """
@@ -71,21 +174,36 @@ class WebSocketThread(QThread):
     Optimized for 100ms real-time updates
     """
     # Qt signals for thread-safe communication
-    data_received = pyqtSignal(list)  # Emits list of single channel values
+    data_received = pyqtSignal(object)  # Emits np.ndarray of single channel values
     connection_status = pyqtSignal(str)  # Emits connection status
-    sample_stats = pyqtSignal(int, int)  # Emits (samples_count, data_length)
     
     def __init__(self):
         super().__init__()
         self.server_ip = "0.0.0.0"
         self.server_port = 8765
         self.running = True
+        
+        # Reusable scratch buffer for the hex parser
+        self._parse_buf = np.empty(4096, dtype=np.uint16)
+        
+        # Statistics are counted here, on the only writer, and read by the
+        # GUI's 1 Hz statistics timer through snapshot()
+        self._stats_lock = threading.Lock()
+        self._total_batches = 0
+        self._total_samples = 0
+        self._last_batch = (0, 0, "-")  # (samples_count, data_length, format)
+        
+        # Set from stop() to end start_server (created on the server loop)
+        self._loop = None
+        self._stop_event = None
+        self._queue = None
     
     def run(self):
         """Main thread execution - runs WebSocket server"""
-        # Create new event loop for this thread
-        loop = asyncio.new_event_loop()
+        # Create new event loop for this thread (uvloop when available)
+        loop = uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
+        self._loop = loop
         
         try:
             loop.run_until_complete(self.start_server())
@@ -97,54 +215,125 @@ class WebSocketThread(QThread):
     async def start_server(self):
         """Start WebSocket server for single channel data"""
         self.connection_status.emit("Server Starting...")
+        self._stop_event = asyncio.Event()
         
-        async with websockets.serve(
-            self.handle_client, 
-            self.server_ip, 
-            self.server_port,
-            ping_interval=30,
-            ping_timeout=10,
-            close_timeout=5
-        ):
-            self.connection_status.emit(f"Server Running on {self.server_ip}:{self.server_port}")
-            
-            # Keep server running
-            while self.running:
-                await asyncio.sleep(0.1)
+        # handle_client only queues raw messages; a single parser task decodes
+        # and emits them, so receiving never waits on parsing. The bounded
+        # queue applies backpressure to the socket if parsing falls behind
+        self._queue = asyncio.Queue(maxsize=64)
+        parser = asyncio.create_task(self._parser_loop(self._queue))
+        
+        # Frames are small: skip permessage-deflate and cap frame size
+        try:
+            async with websockets.serve(
+                self.handle_client,
+                self.server_ip, 
+                self.server_port,
+                ping_interval=30,
+                ping_timeout=10,
+                close_timeout=5,
+                compression=None,
+                max_size=2**16
+            ):
+                self.connection_status.emit(f"Server Running on {self.server_ip}:{self.server_port}")
+                
+                # Keep server running until stop() sets the event
+                if self.running:
+                    await self._stop_event.wait()
+        finally:
+            parser.cancel()
     
     async def handle_client(self, websocket, path):
         """
         Handle ESP32 client connection for single channel data
-        Optimized for 100ms batch processing
+        Only queues raw messages for _parser_loop
         """
         client_ip = websocket.remote_address[0] if websocket.remote_address else "unknown"
         self.connection_status.emit(f"ESP32 Connected: {client_ip}")
         
         try:
             async for message in websocket:
-                if isinstance(message, str) and message.strip():
-                    # Parse single line of hex data (100ms batch)
-                    processed_data = DataProcessor.parse_hex_data(message)
+                # Whitespace-only messages parse to nothing, no strip needed
+                if message:
+                    await self._queue.put(message)
                     
-                    if processed_data:
-                        # Emit data and statistics
-                        self.data_received.emit(processed_data)
-                        self.sample_stats.emit(len(processed_data), len(message))
-                    
-                    # Send acknowledgment
-                    try:
-                        await websocket.send("OK")
-                    except:
-                        return  # Connection lost
+                    # No per-message ack - ping/pong (ping_interval) keeps the link alive
         
         except websockets.exceptions.ConnectionClosed:
             self.connection_status.emit(f"ESP32 Disconnected: {client_ip}")
         except Exception as e:
             self.connection_status.emit(f"Connection Error: {e}")
     
+    async def _parser_loop(self, queue):
+        """
+        Parse queued messages and emit them to the UI
+        Args: queue (asyncio.Queue) - Raw messages from handle_client
+        """
+        # Messages are sent to the UI in batches - one data signal per
+        # 4 messages or 50 ms instead of one per message
+        loop = asyncio.get_running_loop()
+        batch = []
+        flush_handle = None
+        
+        def flush():
+            nonlocal flush_handle
+            if flush_handle is not None:
+                flush_handle.cancel()
+                flush_handle = None
+            self.emit_batch(batch)
+        
+        try:
+            while True:
+                message = await queue.get()
+                
+                # Binary frames carry raw samples; text frames are the
+                # legacy hex format (one 100ms batch per message)
+                if isinstance(message, (bytes, bytearray)):
+                    processed_data = DataProcessor.parse_binary_data(message)
+                    data_format = "BIN"
+                else:
+                    processed_data = DataProcessor.parse_hex_data(message, self._parse_buf)
+                    data_format = "HEX"
+                
+                if len(processed_data):
+                    # Statistics describe single ESP32 messages, not UI batches
+                    with self._stats_lock:
+                        self._total_batches += 1
+                        self._total_samples += len(processed_data)
+                        self._last_batch = (len(processed_data), len(message), data_format)
+                    
+                    batch.append(processed_data)
+                    if len(batch) >= 4:
+                        flush()
+                    elif flush_handle is None:
+                        flush_handle = loop.call_later(0.05, flush)
+        finally:
+            flush()
+    
+    def emit_batch(self, batch):
+        """Emit collected messages as one array and clear the batch"""
+        if batch:
+            self.data_received.emit(np.concatenate(batch))
+            batch.clear()
+    
+    def snapshot(self):
+        """
+        Thread-safe read of the receive statistics
+        Returns: tuple - (total_batches, total_samples, (samples_count, data_length, format) of last batch)
+        """
+        with self._stats_lock:
+            return self._total_batches, self._total_samples, self._last_batch
+    
     def stop(self):
         """Stop the WebSocket thread"""
         self.running = False
+        
+        # Wake start_server on its own loop (no-op if it is not waiting yet)
+        if self._loop and self._stop_event:
+            try:
+                self._loop.call_soon_threadsafe(self._stop_event.set)
+            except RuntimeError:
+                pass  # Loop already closed
 
 class SingleChannelPlotWidget(QWidget):
     """
@@ -156,13 +345,25 @@ class SingleChannelPlotWidget(QWidget):
         super().__init__()
         
         # Data storage for 10-second window at 100ms updates
+        # Preallocated ring buffer of values only; _head is the next write position.
+        # Every value is written twice (slot and slot + max_samples), so the
+        # newest max_samples values are always one contiguous slice
         self.max_samples = 8600  # 10 seconds: 860 SPS * 10 = 8600 samples
-        self.time_data = deque(maxlen=self.max_samples)
-        self.ekg_data = deque(maxlen=self.max_samples)
+        self.max_points = 2000  # Points handed to matplotlib per frame (LTTB)
+        self._y = np.empty(2 * self.max_samples, dtype=np.float32)
+        self._head = 0
+        self._count = 0
         
         # Setup matplotlib plot
         self.setup_plot()
         
+        # Redraw at a fixed ~30 FPS, independent of the message rate;
+        # add_data_batch only marks the plot as dirty
+        self._dirty = False
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.maybe_redraw)
+        self._timer.start(33)
+        
         # Layout
         layout = QVBoxLayout()
         layout.addWidget(self.canvas)
@@ -182,59 +383,94 @@ class SingleChannelPlotWidget(QWidget):
         self.ax.set_ylabel('ADC Value', fontsize=12)
         self.ax.grid(True, alpha=0.3)
         
-        # Initialize empty line
-        self.line, = self.ax.plot([], [], 'b-', linewidth=1.2, alpha=0.8)
+        # Initialize empty line - animated, it is blitted over a cached background
+        self.line, = self.ax.plot([], [], 'b-', linewidth=1.2, alpha=0.8, animated=True)
         
         # Fixed axis limits
         self.ax.set_xlim(0, 10)      # 10 second window
+        
+        # Samples arrive at a fixed rate, so the relative time of each buffer
+        # slot is constant: newest sample at 10 s, oldest at 0 s
+        self._x = np.linspace(0, 10, self.max_samples, dtype=np.float32)
         self.ax.set_ylim(0, 4095)    # Fixed 12-bit ADC range
         
         # Enhance plot appearance
         self.ax.set_facecolor('#f8f9fa')
         self.figure.patch.set_facecolor('white')
         self.figure.tight_layout()
+        
+        # Axes, grid and labels never change (fixed limits), so cache them
+        # after every full draw - including the ones caused by resizing
+        self._bg = None
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+    
+    def on_draw(self, event):
+        """Cache the static background after a full draw and redraw the line on it"""
+        self._bg = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.line)
     
     def add_data_batch(self, values):
         """
-        Add batch of values from 100ms ESP32 transmission
-        Args: values (list) - List of processed decimal values
+        Add batch of values from one or more 100ms ESP32 transmissions
+        Args: values (np.ndarray) - Processed 12-bit values (uint16)
         """
-        current_time = time.time()
-        
-        # Add each value with interpolated timestamp for smooth plotting
-        for i, value in enumerate(values):
-            # Interpolate timestamps within 100ms batch
-            timestamp = current_time + (i * 0.1 / len(values))  # Spread over 100ms
-            
-            self.time_data.append(timestamp)
-            self.ekg_data.append(value)
-        
-        # Update plot immediately for real-time visualization
-        if len(self.time_data) > 1:
+        n = len(values)
+        if n == 0:
+            return
+        
+        # Only the newest max_samples values fit in the buffer
+        if n > self.max_samples:
+            values = values[-self.max_samples:]
+            n = self.max_samples
+        
+        # Copy in at most two slices, wrapping at the end of the ring,
+        # into both halves of the mirrored buffer
+        head = self._head
+        first = min(n, self.max_samples - head)
+        for base in (0, self.max_samples):
+            self._y[base + head:base + head + first] = values[:first]
+            self._y[base:base + n - first] = values[first:]
+        self._head = (head + n) % self.max_samples
+        self._count = min(self._count + n, self.max_samples)
+        self._dirty = True
+    
+    def maybe_redraw(self):
+        """Redraw if new data arrived since the last frame (render timer slot)"""
+        if self._dirty:
+            self._dirty = False
             self.update_plot()
     
     def update_plot(self):
         """Update matplotlib plot with latest data - optimized for speed"""
-        if len(self.time_data) < 2:
+        if self._count < 2:
             return
         
-        # Convert to numpy arrays for efficient plotting
-        times = np.array(self.time_data)
-        values = np.array(self.ekg_data)
+        # The window in time order is a view into the mirrored buffer - no copy
+        end = self._head + self.max_samples
+        values = self._y[end - self._count:end]
+        
+        # Relative time comes from the precomputed axis, newest sample at 10 s
+        relative_times = self._x[-self._count:]
         
-        # Normalize time to 10-second window (relative time)
-        latest_time = times[-1]
-        relative_times = times - latest_time + 10
+        # Several samples share each pixel column - keep the visually
+        # significant ones so Agg draws ~4x fewer vertices
+        if len(values) > self.max_points:
+            keep = lttb_indices(relative_times, values, self.max_points)
+            relative_times = relative_times[keep]
+            values = values[keep]
         
         # Update line data
         self.line.set_data(relative_times, values)
         
-        # Keep fixed axis limits (no auto-scaling for stability)
-        self.ax.set_xlim(0, 10)
-        self.ax.set_ylim(0, 4095)
+        # No background cached yet - a full draw will capture one
+        if self._bg is None:
+            self.canvas.draw_idle()
+            return
         
-        # Fast redraw
-        self.canvas.draw_idle()
+        # Fast redraw: restore the fixed axes and blit only the line
+        self.canvas.restore_region(self._bg)
+        self.ax.draw_artist(self.line)
+        self.canvas.blit(self.ax.bbox)
 
 class MainWindow(QMainWindow):
     """
@@ -245,9 +481,7 @@ class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         
-        # Statistics tracking
-        self.total_batches = 0
-        self.total_samples = 0
+        # Statistics are counted on the WebSocket thread, see update_statistics
         self.start_time = time.time()
         
         self.init_ui()
@@ -292,7 +526,7 @@ class MainWindow(QMainWindow):
         self.connection_label.setFont(QFont("Arial", 10))
         
         # Statistics
-        self.stats_label = QLabel("Batches: 0 | Samples: 0 | Rate: 0 Hz | Format: HEX")
+        self.stats_label = QLabel("Batches: 0 | Samples: 0 | Rate: 0 Hz | Format: -")
         self.stats_label.setFont(QFont("Arial", 10))
         
         # Data info
@@ -317,42 +551,38 @@ class MainWindow(QMainWindow):
         # Connect signals
         self.websocket_thread.data_received.connect(self.on_data_received)
         self.websocket_thread.connection_status.connect(self.on_connection_status)
-        self.websocket_thread.sample_stats.connect(self.on_sample_stats)
         
         # Start thread
         self.websocket_thread.start()
     
     def on_data_received(self, values):
         """Handle new batch of single channel data"""
-        # Update plot with new batch
         self.plot_widget.add_data_batch(values)
-        
-        # Update statistics
-        self.total_batches += 1
-        self.total_samples += len(values)
     
     def on_connection_status(self, status):
         """Handle connection status updates"""
         self.connection_label.setText(f"Status: {status}")
     
-    def on_sample_stats(self, sample_count, data_length):
-        """Handle sample statistics from last batch"""
-        self.data_label.setText(f"Last Batch: {sample_count} samples | Data Length: {data_length}")
-    
     def update_statistics(self):
         """Update statistics display"""
+        # Counters live on the WebSocket thread; read them once per second
+        total_batches, total_samples, last_batch = self.websocket_thread.snapshot()
+        sample_count, data_length, data_format = last_batch
+        
         elapsed_time = time.time() - self.start_time
         
         if elapsed_time > 0:
-            batch_rate = self.total_batches / elapsed_time
-            sample_rate = self.total_samples / elapsed_time
+            batch_rate = total_batches / elapsed_time
+            sample_rate = total_samples / elapsed_time
         else:
             batch_rate = sample_rate = 0
         
         self.stats_label.setText(
-            f"Batches: {self.total_batches} | Samples: {self.total_samples} | "
-            f"Rate: {sample_rate:.1f} Hz | Batch Rate: {batch_rate:.1f}/s | Format: HEX"
+            f"Batches: {total_batches} | Samples: {total_samples} | "
+            f"Rate: {sample_rate:.1f} Hz | Batch Rate: {batch_rate:.1f}/s | Format: {data_format}"
         )
+        
+        self.data_label.setText(f"Last Batch: {sample_count} samples | Data Length: {data_length}")
     
     def closeEvent(self, event):
         """Handle application shutdown"""
@@ -1,12 +1,24 @@
 import asyncio
+import time
 import websockets
 
+RATE_LIMIT_HZ = 1  # Max status prints per second
+
 async def handle(websocket, path):
     print("ESP32 connected!")
     
+    # Only count messages; print a summary of the latest one once per interval
+    last_log = time.monotonic()
+    message_count = 0
+    
     async for message in websocket:
-        print(f"Data received: {len(message.split(','))} points")
-        print(f"Sample: {message[:30]}...")
+        message_count += 1
+        now = time.monotonic()
+        if now - last_log >= 1 / RATE_LIMIT_HZ:
+            print(f"Data received: {message_count} messages, last {message.count(',') + 1} points")
+            print(f"Sample: {message[:30]}...")
+            last_log = now
+            message_count = 0
         await websocket.send("OK")
 
 async def main():
@@ -10,26 +10,48 @@ Expected format: [d1a0,d1a1,d1a2,d1a3,d2a0,d2a1,d2a2,d2a3,d3a0,d3a1,d3a2,d3a3],.
 import asyncio
 import websockets
 import time
-import re
 from datetime import datetime
 
+import numpy as np
+
+RATE_LIMIT_HZ = 1  # Max status prints per second, messages in between are only counted
+
 async def handle(websocket, path):
     client_ip = websocket.remote_address[0] if websocket.remote_address else "unknown"
     print(f"ESP32 EKG connected from {client_ip}")
     print(f"Connection time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
+    # Printing every message stalls the receive loop at ESP32 rates, so only
+    # the latest message is parsed and shown RATE_LIMIT_HZ times per second
+    last_log = time.monotonic()
+    message_count = 0
+    
     try:
         async for message in websocket:
             try:
+                message_count += 1
+                now = time.monotonic()
+                if now - last_log < 1 / RATE_LIMIT_HZ:
+                    continue
+                
+                message_rate = message_count / (now - last_log)
+                last_log = now
+                message_count = 0
+                
                 # Generate timestamp for this batch
                 timestamp = int(time.time())
+                print(f"Timestamp: {timestamp}, Messages: {message_rate:.1f}/s")
                 
                 if isinstance(message, str) and message.strip():
                     # Parse EKG text data format: [d1a0,d1a1,d1a2,d1a3,d2a0,d2a1,d2a2,d2a3,d3a0,d3a1,d3a2,d3a3],...
                     
-                    # Count total sample sets (bracket groups)
-                    bracket_pattern = r'\[([^\]]+)\]'
-                    matches = re.findall(bracket_pattern, message)
+                    # Split into sample sets (bracket groups) on ']' - any separator
+                    # between sets (",", ", ", newlines) is stripped from the pieces
+                    if '[' in message:
+                        matches = [part.strip(',[ \t\r\n') for part in message.split(']')]
+                        matches = [part for part in matches if part]
+                    else:
+                        matches = []
                     
                     if matches:
                         # Parse sample data
@@ -48,19 +70,17 @@ async def handle(websocket, path):
                             print(f"Timestamp: {timestamp}, Channels: {channels}, Samples: {samples_per_channel} per channel, Total sets: {total_sets}")
                             
                             # Optional: Parse and show sample data snippet
-                            sample_values = [int(val) for val in first_set]
-                            print(f"First set values: {sample_values[:6]}...{sample_values[-3:]} (showing first 6 and last 3)")
+                            sample_values = np.array(first_set, dtype=np.int32)
+                            print(f"First set values: {sample_values[:6].tolist()}...{sample_values[-3:].tolist()} (showing first 6 and last 3)")
                             
                             # Optional: Calculate basic statistics
-                            all_values = []
-                            for match in matches[:5]:  # Sample first 5 sets for stats
-                                values = [int(val) for val in match.split(',')]
-                                all_values.extend(values)
+                            # Sample first 5 sets for stats, parsed in one NumPy call
+                            all_values = np.array(','.join(matches[:5]).split(','), dtype=np.int32)
                             
-                            if all_values:
-                                avg_value = sum(all_values) / len(all_values)
-                                min_value = min(all_values)
-                                max_value = max(all_values)
+                            if all_values.size:
+                                avg_value = all_values.mean()
+                                min_value = all_values.min()
+                                max_value = all_values.max()
                                 print(f"Sample stats - Avg: {avg_value:.1f}, Min: {min_value}, Max: {max_value}")
                             
                         else:
@@ -76,15 +96,7 @@ async def handle(websocket, path):
                 else:
                     print(f"Timestamp: {timestamp}, Empty or invalid message received")
                 
-                # Send acknowledgment back to ESP32
-                try:
-                    await websocket.send("OK")
-                except websockets.exceptions.ConnectionClosed:
-                    print(f"Timestamp: {timestamp}, Connection closed while sending acknowledgment")
-                    return
-                except Exception as send_error:
-                    print(f"Timestamp: {timestamp}, Error sending acknowledgment: {send_error}")
-                    return
+                # No per-message "OK" - ping/pong (ping_interval) detects dropped links
                 
             except websockets.exceptions.ConnectionClosed:
                 print(f"Timestamp: {int(time.time())}, ESP32 connection closed gracefully")